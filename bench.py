@@ -0,0 +1,132 @@
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+
+# Startup budgets, in ms, for importing each entry module (cumulative time reported by python -X importtime)
+STARTUP_BUDGETS_MS = {
+	"ppp": 5,
+	"splices": 10,
+	"gcodes": 15,
+	"gcodefile": 40
+}
+
+# Number of times each import is measured, the fastest run is used to reduce noise
+RUNS = 5
+
+def import_time_ms(module):
+	result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import {0}".format(module)], capture_output=True, text=True, check=True)
+	for line in result.stderr.splitlines():
+		# import time: self [us] | cumulative | imported package
+		parts = line.split('|')
+		if len(parts) == 3 and parts[2].strip() == module:
+			return int(parts[1]) / 1000.0
+	raise Exception("no import time reported for {0}".format(module))
+
+def bench_startup():
+	over_budget = False
+	for module, budget in STARTUP_BUDGETS_MS.items():
+		ms = min([import_time_ms(module) for _ in range(RUNS)])
+		over = ms > budget
+		over_budget = over_budget or over
+		print("{0}: {1:.2f}ms (budget {2}ms){3}".format(module, ms, budget, " OVER BUDGET" if over else ""))
+	return not over_budget
+
+# A PrusaSlicer style file with the things that have to survive a round trip: unknown commands, comments after commands,
+# numbers that aren't in their shortest form, indented commands, trailing whitespace and blank lines
+ROUND_TRIP_GCODE = """; generated by PrusaSlicer 2.4.0+linux-x64 on 2021-12-15 at 20:01:33 UTC
+
+;
+
+; external perimeters extrusion width = 0.45mm
+; perimeters extrusion width = 0.45mm
+
+M73 P0 R42
+M73 Q0 S43
+M201 X1000 Y1000 Z200 E5000 ; sets maximum accelerations, mm/sec^2
+M203 X200 Y200 Z12 E120 ; sets maximum feedrates, mm / sec
+M204 P1250 R1250 T1250 ; sets acceleration (P, T) and retract acceleration (R), mm/sec^2
+M205 X8.00 Y8.00 Z0.40 E4.50 ; sets the jerk limits, mm/sec
+M107
+;TYPE:Custom
+M862.3 P "MK3S" ; printer model check
+M862.1 P0.4 ; nozzle diameter check
+M115 U3.10.0 ; tell printer latest fw version
+G90 ; use absolute coordinates
+M83 ; extruder relative mode
+M104 S215 ; set extruder temp
+M140 S60 ; set bed temp
+M190 S60 ; wait for bed temp
+M109 S215 ; wait for extruder temp
+G28 W ; home all without mesh bed level
+G80 ; mesh bed leveling
+G1 Y-3.0 F1000.0 ; go outside print area
+G92 E0.0
+G1 X60.0 E9.0 F1000.0 ; intro line
+G1 X100.0 E12.5 F1000.0 ; intro line
+G92 E0.0
+M221 S95
+G21 ; set units to millimeters
+M900 K0.05 ; Filament gcode LA 1.5
+;LAYER_CHANGE
+;Z:0.2
+;HEIGHT:0.2
+G1 E-.8 F2100
+G1 Z.6 F10800.000
+G1 X87.451 Y91.385
+G1 Z.2
+G1 E.8 F2100
+M204 S800
+G1 F1200
+G1 X88.079 Y90.89 E.02487
+  G1 X88.737 Y90.437 E.02487   
+T1
+M117 Layer 1
+M106 S255
+M107
+G4 ; wait
+M221 S100 ; reset flow
+M900 K0 ; reset LA
+M104 S0 ; turn off temperature
+M140 S0 ; turn off heatbed
+M107 ; turn off fan
+G1 Z30.2 ; Move print head up
+G1 X0 Y200 F3000 ; home X axis
+M84 ; disable motors
+M73 P100 R0
+M73 Q100 S0"""
+
+# Check that reading and writing a file (with GCodeFile and the pipeline) without changing anything gives the same bytes,
+# for LF and CRLF line endings, with and without a newline at the end
+def check_round_trip():
+	import gcodefile
+
+	ok = True
+	with tempfile.TemporaryDirectory() as tmp:
+		for name, newline, final_newline in [("lf", "\n", True), ("lf-no-final-newline", "\n", False), ("crlf", "\r\n", True)]:
+			data = ROUND_TRIP_GCODE.replace("\n", newline)
+			if final_newline:
+				data += newline
+			original = os.path.join(tmp, name + ".gcode")
+			with open(original, "w", newline='') as f:
+				f.write(data)
+
+			# Unknown commands are reported while reading, that's expected here
+			with contextlib.redirect_stdout(io.StringIO()):
+				gcodefile.process_file(original, os.path.join(tmp, name + "-pipeline.gcode"))
+				gcodefile.GCodeFile(original, validate=False).write(os.path.join(tmp, name + "-file.gcode"))
+
+			for method in ["pipeline", "file"]:
+				with open(os.path.join(tmp, "{0}-{1}.gcode".format(name, method)), "rb") as f:
+					same = f.read() == data.encode()
+				ok = ok and same
+				print("round trip {0} ({1}): {2}".format(name, method, "identical" if same else "DIFFERENT"))
+	return ok
+
+if __name__ == "__main__":
+	startup_ok = bench_startup()
+	round_trip_ok = check_round_trip()
+	if not startup_ok or not round_trip_ok:
+		sys.exit(1)
@@ -0,0 +1,305 @@
+import math
+
+from gcodes import GCodeClockwiseArcMove, GCodeCounterClockwiseArcMove, GCodeHome, GCodeLinearMove, GCodeMove, GCodeSetExtruderToAbsoluteMode, GCodeSetExtruderToRelativeMode, GCodeSetPosition, GCodeSetToAbsolutePositioning, GCodeSetToRelativePositioning, format_number
+
+# Furthest (mm) the compacted path may be from the original path
+DEFAULT_TOLERANCE = 0.01
+# How much (relative) the extrusion per mm of the merged moves may differ
+DEFAULT_EXTRUSION_TOLERANCE = 0.05
+# Most moves that are merged into one. Bounds the cost of fitting, which is quadratic in the number of moves merged
+DEFAULT_MAX_MERGE = 64
+# Arcs with a larger radius are left as lines
+MAX_ARC_RADIUS = 1000.0
+
+_EPSILON = 1e-9
+
+class CompactionReport:
+	def __init__(self):
+		self.lines_in = 0
+		self.lines_out = 0
+		self.bytes_in = 0
+		self.bytes_out = 0
+		# Moves replaced by merged lines and arcs
+		self.moves_merged = 0
+		self.lines_created = 0
+		self.arcs_created = 0
+		self.max_deviation = 0.0
+
+	def size_reduction(self):
+		if self.bytes_in == 0:
+			return 0.0
+		return 1.0 - self.bytes_out / float(self.bytes_in)
+
+	def __str__(self):
+		return "{0} -> {1} lines, {2} -> {3} bytes ({4:.1%} smaller), {5} moves merged into {6} lines and {7} arcs, max deviation {8:.4f}mm".format(
+			self.lines_in, self.lines_out, self.bytes_in, self.bytes_out, self.size_reduction(), self.moves_merged, self.lines_created, self.arcs_created, self.max_deviation)
+
+# A run of G1 moves in the XY plane that can be merged. xs/ys[0] is the position before the first move, xs/ys[k] is the
+# position after move k (1 based), extrusion[k - 1] and lengths[k - 1] are the filament used by and the length of move k
+class _Run:
+	def __init__(self, x, y, relative_e):
+		self.moves = []
+		self.xs = [x]
+		self.ys = [y]
+		self.extrusion = []
+		self.lengths = []
+		self.relative_e = relative_e
+		self.extruding = None
+
+	def add(self, move, x, y, e_delta):
+		self.lengths.append(math.hypot(x - self.xs[-1], y - self.ys[-1]))
+		self.moves.append(move)
+		self.xs.append(x)
+		self.ys.append(y)
+		self.extrusion.append(e_delta)
+
+class _Compactor:
+	def __init__(self, tolerance, extrusion_tolerance, max_merge, report):
+		self.tolerance = tolerance
+		self.extrusion_tolerance = extrusion_tolerance
+		self.max_merge = max_merge
+		self.report = report
+
+	def _rates_match(self, run, s, j, length):
+		if not run.extruding:
+			return True
+		total = sum(run.extrusion[s:j])
+		if length < _EPSILON or total <= 0:
+			return False
+		rate = total / length
+		for k in range(s, j):
+			if run.lengths[k] < _EPSILON:
+				return False
+			if abs(run.extrusion[k] / run.lengths[k] - rate) > self.extrusion_tolerance * rate:
+				return False
+		return True
+
+	# Max distance of the points between s and j from the line from s to j, or None if they can't be merged into a line
+	def _line_deviation(self, run, s, j):
+		xs, ys = run.xs, run.ys
+		dx = xs[j] - xs[s]
+		dy = ys[j] - ys[s]
+		length = math.hypot(dx, dy)
+		if length < _EPSILON:
+			return None
+		ux, uy = dx / length, dy / length
+
+		deviation = 0.0
+		last_t = 0.0
+		for k in range(s + 1, j):
+			px = xs[k] - xs[s]
+			py = ys[k] - ys[s]
+			t = px * ux + py * uy
+			# Points have to move forward along the line, otherwise the path doubles back
+			if t < last_t or t > length:
+				return None
+			last_t = t
+			deviation = max(deviation, abs(px * uy - py * ux))
+			if deviation > self.tolerance:
+				return None
+
+		if not self._rates_match(run, s, j, sum(run.lengths[s:j])):
+			return None
+		return deviation
+
+	# Circle through the points at s, the middle and j. Returns [center x, center y, radius, clockwise, deviation] or None
+	# if the points between s and j can't be merged into an arc
+	def _arc(self, run, s, j):
+		xs, ys = run.xs, run.ys
+		m = (s + j) // 2
+		ax, ay = xs[s], ys[s]
+		bx, by = xs[m], ys[m]
+		cx, cy = xs[j], ys[j]
+		d = 2.0 * (ax * (by - cy) + bx * (cy - ay) + cx * (ay - by))
+		if abs(d) < _EPSILON:
+			return None
+		a2 = ax * ax + ay * ay
+		b2 = bx * bx + by * by
+		c2 = cx * cx + cy * cy
+		ox = (a2 * (by - cy) + b2 * (cy - ay) + c2 * (ay - by)) / d
+		oy = (a2 * (cx - bx) + b2 * (ax - cx) + c2 * (bx - ax)) / d
+		r = math.hypot(ax - ox, ay - oy)
+		if r > MAX_ARC_RADIUS:
+			return None
+
+		deviation = 0.0
+		sweep = 0.0
+		clockwise = None
+		for k in range(s, j + 1):
+			deviation = max(deviation, abs(math.hypot(xs[k] - ox, ys[k] - oy) - r))
+			if k < j:
+				# Every move has to turn the same way around the center
+				v1x, v1y = xs[k] - ox, ys[k] - oy
+				v2x, v2y = xs[k + 1] - ox, ys[k + 1] - oy
+				cross = v1x * v2y - v1y * v2x
+				if abs(cross) < _EPSILON:
+					return None
+				if clockwise is None:
+					clockwise = cross < 0
+				elif clockwise != (cross < 0):
+					return None
+				sweep += abs(math.atan2(cross, v1x * v2x + v1y * v2y))
+
+				# The original moves are chords of the arc
+				half = run.lengths[k] / 2.0
+				if half > r:
+					return None
+				deviation = max(deviation, r - math.sqrt(r * r - half * half))
+			if deviation > self.tolerance:
+				return None
+
+		if sweep >= 2.0 * math.pi - 0.01:
+			return None
+		if not self._rates_match(run, s, j, r * sweep):
+			return None
+		return [ox, oy, r, clockwise, deviation]
+
+	def _merged_parts(self, run, s, j):
+		e = None
+		if run.extruding:
+			e = sum(run.extrusion[s:j]) if run.relative_e else run.moves[j - 1].e()
+		f = run.moves[s].f()
+		return [e, f]
+
+	def _create_line(self, run, s, j):
+		e, f = self._merged_parts(run, s, j)
+		line = "G1 X{0} Y{1}".format(format_number(run.xs[j]), format_number(run.ys[j]))
+		if e is not None:
+			line += " E{0}".format(format_number(e))
+		if f is not None:
+			line += " F{0}".format(format_number(f))
+		return GCodeLinearMove(line)
+
+	def _create_arc(self, run, s, j, arc):
+		ox, oy, r, clockwise, deviation = arc
+		e, f = self._merged_parts(run, s, j)
+		line = "{0} X{1} Y{2} I{3} J{4}".format("G2" if clockwise else "G3", format_number(run.xs[j]), format_number(run.ys[j]),
+			format_number(ox - run.xs[s]), format_number(oy - run.ys[s]))
+		if e is not None:
+			line += " E{0}".format(format_number(e))
+		if f is not None:
+			line += " F{0}".format(format_number(f))
+		if clockwise:
+			return GCodeClockwiseArcMove(line)
+		return GCodeCounterClockwiseArcMove(line)
+
+	# Replace the moves of a run with merged lines and arcs, greedily merging as many moves as possible from the start
+	def compact(self, run, result):
+		n = len(run.moves)
+		s = 0
+		while s < n:
+			limit = min(n, s + self.max_merge)
+
+			line_end = s + 1
+			line_deviation = 0.0
+			j = s + 2
+			while j <= limit:
+				deviation = self._line_deviation(run, s, j)
+				if deviation is None:
+					break
+				line_end, line_deviation = j, deviation
+				j += 1
+
+			arc_end = s + 1
+			arc = None
+			j = s + 3
+			while j <= limit:
+				fitted = self._arc(run, s, j)
+				if fitted is None:
+					break
+				arc_end, arc = j, fitted
+				j += 1
+
+			if arc is not None and arc_end > line_end:
+				result.append(self._create_arc(run, s, arc_end, arc))
+				self.report.arcs_created += 1
+				self.report.moves_merged += arc_end - s
+				self.report.max_deviation = max(self.report.max_deviation, arc[4])
+				s = arc_end
+			elif line_end > s + 1:
+				result.append(self._create_line(run, s, line_end))
+				self.report.lines_created += 1
+				self.report.moves_merged += line_end - s
+				self.report.max_deviation = max(self.report.max_deviation, line_deviation)
+				s = line_end
+			else:
+				result.append(run.moves[s])
+				s += 1
+
+# Merge runs of collinear G1 moves into single moves and fit G2/G3 arcs to runs that follow a circle, within tolerance
+# (mm) of the original path and keeping the extrusion per mm within extrusion_tolerance. Only consecutive G1 moves in the
+# XY plane with absolute positioning are merged: any other gcode (tool changes, temperatures, comments...) ends a run.
+#
+# Returns the compacted gcodes and a CompactionReport
+def compact_moves(gcodes, tolerance=DEFAULT_TOLERANCE, extrusion_tolerance=DEFAULT_EXTRUSION_TOLERANCE, max_merge=DEFAULT_MAX_MERGE):
+	report = CompactionReport()
+	compactor = _Compactor(tolerance, extrusion_tolerance, max_merge, report)
+	result = []
+
+	x = y = z = None
+	e = 0.0
+	relative_e = False
+	absolute_positioning = True
+	run = None
+
+	for g in gcodes:
+		mergeable = (absolute_positioning and x is not None and y is not None
+			and isinstance(g, GCodeLinearMove) and g.comment is None
+			and ('X' in g.parts or 'Y' in g.parts) and 'S' not in g.parts
+			and (g.z() is None or g.z() == z))
+		if mergeable:
+			extruding = g.e() is not None
+			if run is not None and (g.f() is not None or run.extruding != extruding):
+				compactor.compact(run, result)
+				run = None
+			if run is None:
+				run = _Run(x, y, relative_e)
+				run.extruding = extruding
+
+			new_x = g.x() if g.x() is not None else x
+			new_y = g.y() if g.y() is not None else y
+			e_delta = 0.0
+			if extruding:
+				e_delta = g.e() if relative_e else g.e() - e
+			run.add(g, new_x, new_y, e_delta)
+		else:
+			if run is not None:
+				compactor.compact(run, result)
+				run = None
+			result.append(g)
+
+		# Track the position and extrusion mode
+		if isinstance(g, GCodeMove):
+			if absolute_positioning:
+				if g.x() is not None: x = g.x()
+				if g.y() is not None: y = g.y()
+				if g.z() is not None: z = g.z()
+			if g.e() is not None and not relative_e:
+				e = g.e()
+		elif isinstance(g, GCodeSetPosition):
+			if g.x() is not None: x = g.x()
+			if g.y() is not None: y = g.y()
+			if g.z() is not None: z = g.z()
+			if g.e() is not None: e = g.e()
+		elif isinstance(g, GCodeHome):
+			if g.home_x(): x = None
+			if g.home_y(): y = None
+			if g.home_z(): z = None
+		elif isinstance(g, GCodeSetToAbsolutePositioning):
+			absolute_positioning = True
+		elif isinstance(g, GCodeSetToRelativePositioning):
+			absolute_positioning = False
+			x = y = z = None
+		elif isinstance(g, GCodeSetExtruderToAbsoluteMode):
+			relative_e = False
+		elif isinstance(g, GCodeSetExtruderToRelativeMode):
+			relative_e = True
+
+	if run is not None:
+		compactor.compact(run, result)
+
+	report.lines_in = len(gcodes)
+	report.lines_out = len(result)
+	report.bytes_in = sum([len(g.raw()) + 1 for g in gcodes])
+	report.bytes_out = sum([len(g.raw()) + 1 for g in result])
+	return [result, report]
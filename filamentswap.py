@@ -0,0 +1,152 @@
+import heapq
+
+from gcodes import GCodeComment, GCodeMove, GCodePausePrint, GCodeToolChange
+
+# Number of filament inputs on a Palette / Palette+
+PALETTE_INPUTS = 4
+
+# Comments slicers put at the start of each layer (PrusaSlicer/Slic3r and Cura)
+LAYER_CHANGE_COMMENTS = (";LAYER_CHANGE", ";LAYER:")
+
+_NEVER = float("inf")
+
+# A filament that has to be swapped into a slot before the tool change at index event (in the tool change sequence)
+class FilamentSwap:
+	def __init__(self, event, tool, slot, replaced_tool):
+		self.event = event
+		self.tool = tool
+		self.slot = slot
+		self.replaced_tool = replaced_tool
+
+	def __repr__(self):
+		return "FilamentSwap(event={0}, tool={1}, slot={2}, replaced_tool={3})".format(self.event, self.tool, self.slot, self.replaced_tool)
+
+class FilamentSchedule:
+	def __init__(self, tools, slots):
+		self.tools = tools
+		self.slots = slots
+		# Slot used for each tool change in tools
+		self.assignments = []
+		# Slot each tool is loaded into before the print starts
+		self.initial_slots = {}
+		self.swaps = []
+		# [z, tools] for each layer that uses more tools then there are slots
+		self.overloaded_layers = []
+
+	def swap_count(self):
+		return len(self.swaps)
+
+# Get the sequence of logical tools used by the tool changes in gcodes
+def tool_sequence(gcodes):
+	return [g.tool() for g in gcodes if isinstance(g, GCodeToolChange) and g.tool() is not None]
+
+# Assign logical tools to physical slots so the number of filament swaps is minimal.
+#
+# This is Belady's optimal cache replacement: when a tool isn't loaded and every slot is used, the loaded tool that is
+# next used furthest in the future is swapped out. Next uses are precomputed in one backwards pass and the loaded tools
+# are kept in a max-heap by next use. Stale heap entries are skipped when popped and the heap is rebuilt from the loaded
+# tools once it has more then 2k entries, so it stays O(k) and the whole solve is O(n log k).
+def schedule_tools(tools, slots=PALETTE_INPUTS):
+	schedule = FilamentSchedule(tools, slots)
+
+	next_use = [_NEVER] * len(tools)
+	last_seen = {}
+	for i in range(len(tools) - 1, -1, -1):
+		next_use[i] = last_seen.get(tools[i], _NEVER)
+		last_seen[tools[i]] = i
+
+	loaded = {}
+	loaded_next_use = {}
+	free_slots = list(range(slots - 1, -1, -1))
+	heap = []
+	for i, tool in enumerate(tools):
+		if tool not in loaded:
+			if free_slots:
+				slot = free_slots.pop()
+				schedule.initial_slots[tool] = slot
+			else:
+				while True:
+					neg_next, victim = heapq.heappop(heap)
+					if victim in loaded and loaded_next_use[victim] == -neg_next:
+						break
+				slot = loaded.pop(victim)
+				del loaded_next_use[victim]
+				schedule.swaps.append(FilamentSwap(i, tool, slot, victim))
+			loaded[tool] = slot
+
+		loaded_next_use[tool] = next_use[i]
+		heapq.heappush(heap, (-next_use[i], tool))
+		if len(heap) > 2 * slots:
+			heap = [(-n, t) for t, n in loaded_next_use.items()]
+			heapq.heapify(heap)
+		schedule.assignments.append(loaded[tool])
+
+	return schedule
+
+# Find the layers that use more tools then slots. Layers start at the slicer's layer change comments. Files without them
+# are split by the Z of extruding moves (moves in X/Y with E), so Z hops and parking moves don't start a layer
+def find_overloaded_layers(gcodes, slots=PALETTE_INPUTS):
+	overloaded = []
+	current_tool = None
+	layer_z = None
+	layer_tools = set()
+	z = None
+	layer_comments = False
+
+	def finish_layer():
+		if len(layer_tools) > slots:
+			overloaded.append([layer_z, sorted(layer_tools)])
+
+	def start_layer():
+		finish_layer()
+		return set() if current_tool is None else {current_tool}
+
+	for g in gcodes:
+		if isinstance(g, GCodeComment):
+			if g.comment.strip().upper().startswith(LAYER_CHANGE_COMMENTS):
+				layer_tools = start_layer()
+				layer_z = None
+				layer_comments = True
+		elif isinstance(g, GCodeMove):
+			if g.z() is not None:
+				z = g.z()
+			extruding = g.e() is not None and (g.x() is not None or g.y() is not None)
+			if extruding and z != layer_z:
+				if not layer_comments:
+					layer_tools = start_layer()
+				layer_z = z
+		elif isinstance(g, GCodeToolChange) and g.tool() is not None:
+			current_tool = g.tool()
+			layer_tools.add(current_tool)
+	finish_layer()
+
+	return overloaded
+
+# Reduce the tools used by gcodes to the given number of slots. Tool changes are rewritten to the slot the tool is
+# loaded in and a pause is inserted before each tool change that needs a filament swap.
+#
+# Returns the new list of gcodes and the schedule that was used
+def rewrite_tool_changes(gcodes, slots=PALETTE_INPUTS):
+	schedule = schedule_tools(tool_sequence(gcodes), slots)
+	schedule.overloaded_layers = find_overloaded_layers(gcodes, slots)
+	for z, tools in schedule.overloaded_layers:
+		print("WARN: layer at Z{0} uses {1} filaments ({2}), but only {3} can be loaded. There will be filament swaps within the layer".format(z, len(tools), ', '.join(["T{0}".format(t) for t in tools]), slots))
+
+	swaps = {swap.event: swap for swap in schedule.swaps}
+	result = []
+	event = 0
+	for g in gcodes:
+		if isinstance(g, GCodeToolChange) and g.tool() is not None:
+			if event in swaps:
+				swap = swaps[event]
+				result.append(GCodeComment("; Filament swap: replace T{0} with T{1} in slot {2}".format(swap.replaced_tool, swap.tool, swap.slot)))
+				result.append(GCodePausePrint("M601"))
+			# Same class and parts as the original, only the tool changes
+			tool_change = type(g)(g.raw().strip())
+			tool_change.set_tool(schedule.assignments[event])
+			result.append(tool_change)
+			event += 1
+		else:
+			result.append(g)
+
+	return [result, schedule]
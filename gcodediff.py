@@ -0,0 +1,225 @@
+import argparse
+import difflib
+import hashlib
+import itertools
+import sys
+
+from gcodes import GCodeComment, GCodeFactory, GCodeMove, GCodeParted, GCodeUnknown, GCodeWhitespace
+
+# Streaming, layer aware comparison of two gcode files, to check a post processed file only differs from the original where
+# expected. Each layer's normalized commands are hashed and the files are read twice: first only the layer hashes (and Z)
+# are kept and the layers of both files are matched by hash, then the layers are read again and only the ones that didn't
+# match are compared command by command, one layer (or a few) at a time. Matching by hash keeps the files aligned when a
+# layer is added or removed (a park or a Z hop inserted by post processing moves Z and starts a new layer).
+
+# Gcodes that post processing is expected to insert
+DEFAULT_ALLOWED_INSERTS = ("M104", "M109", "G4")
+# Most layers compared together when layers don't line up by Z (a park splits a layer into several). Bounds the memory and
+# time of comparing them
+MAX_GROUP_LAYERS = 8
+
+INSERTED = "inserted"
+REMOVED = "removed"
+CHANGED = "changed"
+
+class Difference:
+	def __init__(self, kind, layer, original_line, new_line, name, description):
+		self.kind = kind
+		self.layer = layer
+		# 1 based line numbers, None when the command isn't in that file
+		self.original_line = original_line
+		self.new_line = new_line
+		self.name = name
+		self.description = description
+
+	def __str__(self):
+		return "layer {0}, line {1} -> {2}: {3} {4}".format(self.layer, self.original_line or '-', self.new_line or '-', self.kind, self.description)
+
+class _Command:
+	def __init__(self, layer, line_no, key, gcode, text):
+		# 0 based layer the command is in
+		self.layer = layer
+		self.line_no = line_no
+		# Normalized command, compared between the files
+		self.key = key
+		self.gcode = gcode
+		self.text = text
+
+def _normalize(gcode, text):
+	if isinstance(gcode, GCodeUnknown):
+		return "?" + text.strip()
+	if isinstance(gcode, GCodeParted):
+		return gcode.name + ' '.join(["{0}{1}".format(c, gcode.parts[c]) for c in sorted(gcode.parts)])
+	return gcode.name
+
+# Yield [first line, hash, commands, Z] for each layer of a file. A new layer starts when a move changes Z (Z is None for
+# the commands before the first Z). Comments and whitespace aren't commands and are ignored
+def read_layers(file):
+	factory = GCodeFactory()
+	commands = []
+	first_line = 1
+	digest = hashlib.blake2b(digest_size=16)
+	z = None
+	layer = 0
+
+	with open(file, "r") as f:
+		for line_no, line in enumerate(f, 1):
+			g = factory.create_from_line(line)
+			if isinstance(g, GCodeComment) or isinstance(g, GCodeWhitespace):
+				continue
+
+			if isinstance(g, GCodeMove) and g.z() is not None and g.z() != z:
+				if commands:
+					yield [first_line, digest.digest(), commands, z]
+					layer += 1
+				z = g.z()
+				commands = []
+				first_line = line_no
+				digest = hashlib.blake2b(digest_size=16)
+
+			key = _normalize(g, line)
+			digest.update(key.encode())
+			digest.update(b"\n")
+			commands.append(_Command(layer, line_no, key, g, line.rstrip()))
+
+	if commands:
+		yield [first_line, digest.digest(), commands, z]
+
+def _changed_parameters(original, new):
+	if not isinstance(original.gcode, GCodeParted) or not isinstance(new.gcode, GCodeParted) or original.gcode.name != new.gcode.name:
+		return "{0} -> {1}".format(original.text, new.text)
+	changes = []
+	for c in sorted(set(original.gcode.parts) | set(new.gcode.parts)):
+		a = original.gcode.parts.get(c)
+		b = new.gcode.parts.get(c)
+		if a != b:
+			changes.append("{0}: {1} -> {2}".format(c, '-' if a is None else a, '-' if b is None else b))
+	return "{0} {1}".format(new.gcode.name, ', '.join(changes))
+
+def _name(command):
+	if isinstance(command.gcode, GCodeUnknown):
+		return None
+	return command.gcode.name
+
+# Compare the commands of a few layers. Differences are reported with the layer of the original command, inserted commands
+# with the layer of the original command before them (or layer, the first original layer compared, if there isn't one)
+def _diff_layers(layer, original, new):
+	matcher = difflib.SequenceMatcher(None, [c.key for c in original], [c.key for c in new], autojunk=False)
+	for tag, a1, a2, b1, b2 in matcher.get_opcodes():
+		if tag == "equal":
+			continue
+		if tag == "replace":
+			# Commands replaced one for one are changed parameters, anything left over was inserted or removed
+			count = min(a2 - a1, b2 - b1)
+			for a, b in zip(original[a1:a1 + count], new[b1:b1 + count]):
+				yield Difference(CHANGED, a.layer, a.line_no, b.line_no, _name(b), _changed_parameters(a, b))
+			a1 += count
+			b1 += count
+		for a in original[a1:a2]:
+			yield Difference(REMOVED, a.layer, a.line_no, None, _name(a), a.text)
+		inserted_layer = original[a1 - 1].layer if a1 > 0 else layer
+		for b in new[b1:b2]:
+			yield Difference(INSERTED, inserted_layer, None, b.line_no, _name(b), b.text)
+
+# [hashes, Zs] of the layers of a file
+def _layer_keys(file):
+	hashes = []
+	zs = []
+	for first_line, digest, commands, z in read_layers(file):
+		hashes.append(digest)
+		zs.append(z)
+	return [hashes, zs]
+
+# How the layers of a block that didn't match by hash are compared: [original layer count, new layer count] for each
+# comparison, in order. Layers at the same Z are compared one to one. Layers without one at the same Z (a park splits a
+# layer into several) are compared together with the pairs of layers before and after them, as either could be the rest
+# of the layer that was split, unless there are more than MAX_GROUP_LAYERS of them: those are compared one to one too
+def _layer_groups(original_z, new_z):
+	groups = []
+	# If the last group is a pair of layers at the same Z
+	paired = False
+	# Layers waiting to be compared with the next pair
+	pending = None
+	matcher = difflib.SequenceMatcher(None, original_z, new_z, autojunk=False)
+	for tag, a1, a2, b1, b2 in matcher.get_opcodes():
+		if tag == "equal":
+			count = a2 - a1
+			if pending:
+				groups.append([pending[0] + 1, pending[1] + 1])
+				pending = None
+				count -= 1
+			groups += [[1, 1] for _ in range(count)]
+			paired = count > 0
+			continue
+
+		a = a2 - a1
+		b = b2 - b1
+		if a + b > MAX_GROUP_LAYERS:
+			groups += [[1 if i < a else 0, 1 if i < b else 0] for i in range(max(a, b))]
+		elif paired:
+			groups.pop()
+			pending = [a + 1, b + 1]
+		else:
+			pending = [a, b]
+		paired = False
+	if pending:
+		groups.append(pending)
+	return groups
+
+# The commands of the next count layers, as one list
+def _take_commands(layers, count):
+	commands = []
+	for layer in itertools.islice(layers, count):
+		commands += layer[2]
+	return commands
+
+def _skip(layers, count):
+	for _ in itertools.islice(layers, count):
+		pass
+
+# Yield the differences between two gcode files. Only a few layers of each file are in memory at a time
+def diff_files(original_file, new_file):
+	original_hashes, original_z = _layer_keys(original_file)
+	new_hashes, new_z = _layer_keys(new_file)
+	original_layers = read_layers(original_file)
+	new_layers = read_layers(new_file)
+
+	matcher = difflib.SequenceMatcher(None, original_hashes, new_hashes, autojunk=False)
+	for tag, a1, a2, b1, b2 in matcher.get_opcodes():
+		if tag == "equal":
+			_skip(original_layers, a2 - a1)
+			_skip(new_layers, b2 - b1)
+			continue
+		layer = a1
+		for original_count, new_count in _layer_groups(original_z[a1:a2], new_z[b1:b2]):
+			yield from _diff_layers(layer, _take_commands(original_layers, original_count), _take_commands(new_layers, new_count))
+			layer += original_count
+
+# Differences that aren't an insertion of one of the allowed gcodes
+def unexpected_differences(differences, allowed_inserts=DEFAULT_ALLOWED_INSERTS):
+	for d in differences:
+		if d.kind != INSERTED or d.name not in allowed_inserts:
+			yield d
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Compare an original and a post processed gcode file")
+	parser.add_argument("original")
+	parser.add_argument("processed")
+	parser.add_argument("--allow", nargs="*", default=list(DEFAULT_ALLOWED_INSERTS), help="gcodes that are expected to be inserted")
+	parser.add_argument("--all", action="store_true", help="print expected differences too")
+	args = parser.parse_args()
+
+	expected = 0
+	unexpected = 0
+	for d in diff_files(args.original, args.processed):
+		if d.kind == INSERTED and d.name in args.allow:
+			expected += 1
+			if args.all:
+				print(d)
+		else:
+			unexpected += 1
+			print(d)
+
+	print("{0} expected and {1} unexpected differences".format(expected, unexpected))
+	if unexpected:
+		sys.exit(1)
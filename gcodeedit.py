@@ -0,0 +1,89 @@
+from array import array
+
+# Bytes copied at a time when writing unchanged lines
+_COPY_CHUNK_SIZE = 1024 * 1024
+
+# Edits to a gcode file, kept separate from the file (a piece table): the original file is never modified or loaded as
+# gcodes, each edit is stored by the line number it applies to (0 based, lines of the original file) and writing streams
+# the original bytes between the edited lines. Inserting, replacing and deleting are O(1) no matter how many edits there are.
+class GCodeEdits:
+	def __init__(self, file):
+		self.file = file
+		self._inserts = {}
+		self._replaced = {}
+		self._read_offsets()
+
+	def _read_offsets(self):
+		# Offset of the start of every line, plus the end of the file
+		self._offsets = array('Q', [0])
+		offset = 0
+		self._ends_with_newline = True
+		# Line ending of the file (from its first line), edits are written with it
+		self._newline = None
+		with open(self.file, "rb") as f:
+			for line in f:
+				offset += len(line)
+				self._offsets.append(offset)
+				self._ends_with_newline = line.endswith(b"\n")
+				if self._newline is None:
+					self._newline = b"\r\n" if line.endswith(b"\r\n") else b"\n"
+		if self._newline is None:
+			self._newline = b"\n"
+
+	def line_count(self):
+		return len(self._offsets) - 1
+
+	def _check_line(self, line_no, allow_end=False):
+		if line_no < 0 or line_no > self.line_count() or (line_no == self.line_count() and not allow_end):
+			raise IndexError("line {0} is not in {1} ({2} lines)".format(line_no, self.file, self.line_count()))
+
+	# Insert gcode before line_no. Gcodes inserted before the same line are written in the order they're inserted.
+	# line_no can be the line count to insert at the end of the file
+	def insert_before(self, line_no, gcode):
+		self._check_line(line_no, True)
+		if line_no in self._inserts:
+			self._inserts[line_no].append(gcode)
+		else:
+			self._inserts[line_no] = [gcode]
+
+	def replace(self, line_no, gcode):
+		self._check_line(line_no)
+		self._replaced[line_no] = gcode
+
+	def delete(self, line_no):
+		self._check_line(line_no)
+		self._replaced[line_no] = None
+
+	def edit_count(self):
+		return sum([len(gcodes) for gcodes in self._inserts.values()]) + len(self._replaced)
+
+	def _copy(self, src, dst, start, end):
+		src.seek(start)
+		remaining = end - start
+		while remaining > 0:
+			data = src.read(min(remaining, _COPY_CHUNK_SIZE))
+			if not data:
+				break
+			dst.write(data)
+			remaining -= len(data)
+
+	# Write the edited file. Lines that weren't edited are copied as raw bytes from the original file
+	def write(self, file):
+		edited_lines = sorted(set(self._inserts) | set(self._replaced))
+		with open(self.file, "rb") as src, open(file, "wb") as dst:
+			line_no = 0
+			for edited in edited_lines:
+				self._copy(src, dst, self._offsets[line_no], self._offsets[edited])
+				line_no = edited
+				if edited == self.line_count() and not self._ends_with_newline:
+					# Inserting after the last line, which doesn't end the file with a newline
+					dst.write(self._newline)
+
+				for gcode in self._inserts.get(edited, []):
+					dst.write(gcode.raw().encode() + self._newline)
+				if edited in self._replaced:
+					gcode = self._replaced[edited]
+					if gcode is not None:
+						dst.write(gcode.raw().encode() + self._newline)
+					line_no = edited + 1
+			self._copy(src, dst, self._offsets[line_no], self._offsets[-1])
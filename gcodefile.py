@@ -1,33 +1,206 @@
-from gcodes import GCodeFactory
+import itertools
+import queue
+import threading
+
+from gcodes import GCodeFactory, GCodeUnknown
+from validation import ValidationIssue, Validator
+
+# Lines per batch passed between pipeline stages. Large so the queue overhead is small compared to the work per batch
+DEFAULT_BATCH_SIZE = 4096
+# Batches that can be waiting between two stages before the producing stage blocks
+DEFAULT_QUEUE_DEPTH = 8
 
 class GCodeFile:
-	def __init__(self, file):
+	# validator is used to check the gcodes once they're read (a default Validator if None). With validate False no checks are done
+	def __init__(self, file, validate=True, validator=None):
 		self.file = file
 		self._read_file()
+		self.issues = []
+		if validate:
+			self.issues = (validator or Validator()).validate(self.gcodes)
+			for issue in self.issues:
+				print(issue)
 
 	def _read_file(self):
 		self.gcodes = []
+		# Line ending of the file, and if the last line ends with one, so the file is written back the same way
+		self.newline = None
+		self.final_newline = True
 		factory = GCodeFactory()
-		with open(self.file, "r") as f:
+		with open(self.file, "r", newline='') as f:
 			for line in f:
-				tmp = line.strip()
-				if tmp == '':
-					self.gcodes.append(factory.create_whitespace())
-				elif tmp.startswith(";"):
-					self.gcodes.append(factory.create_comment(line.rstrip()))
-				elif tmp.find(' ') > 0:
-					g = factory.create(tmp[:tmp.find(' ')], line)
-					if g:
-						self.gcodes.append(g)
-					else:
-						print("<1> Unknown gcode element: {0}".format(line.rstrip()))
-				else:
-					g = factory.create(tmp, tmp)
-					if g:
-						self.gcodes.append(g)
-					else:
-						print("<2> Unknown gcode element: {0}".format(line.rstrip()))
+				if self.newline is None:
+					self.newline = _line_ending(line)
+				self.final_newline = line.endswith("\n")
+				g = factory.create_from_line(line)
+				if isinstance(g, GCodeUnknown):
+					print("Unknown gcode element: {0}".format(line.rstrip()))
+				self.gcodes.append(g)
 
 	def print(self):
 		for g in self.gcodes:
 			g.print_raw()
+
+	def write(self, file):
+		with open(file, "w", newline='') as f:
+			write_gcodes(f, self.gcodes, self.newline or "\n", self.final_newline)
+
+def _line_ending(line):
+	if line.endswith("\r\n"):
+		return "\r\n"
+	return "\n"
+
+# Write gcodes to a file opened with newline='' (so the line endings are written as given)
+def write_gcodes(f, gcodes, newline="\n", final_newline=True):
+	if gcodes:
+		f.write(newline.join([g.raw() for g in gcodes]))
+		if final_newline:
+			f.write(newline)
+
+class _PipelineStage(threading.Thread):
+	def __init__(self, name, work, stop):
+		threading.Thread.__init__(self, name=name, daemon=True)
+		self._work = work
+		self._stop_event = stop
+		self.error = None
+
+	def run(self):
+		try:
+			self._work()
+		except BaseException as e:
+			self.error = e
+			self._stop_event.set()
+
+# Process a gcode file as a three stage pipeline: a reader thread producing batches of lines, a parse stage (on the calling thread)
+# creating the gcodes and running analyze/transform on each batch, and a writer thread doing bulk writes of the result.
+#
+# - analyze(lines) is called with each batch of raw lines (ppp.py style analysis works on the raw lines, such as
+#   ppp.ExtruderAnalyzer().analyze)
+# - transform(gcodes) is called with each batch of parsed gcodes and returns the gcodes to write
+# - progress(line_count) is called after each batch is parsed with the total number of lines parsed so far
+# - validator checks each batch of parsed gcodes (before transform) (a default Validator if None). With validate False no
+#   checks are done, same as GCodeFile
+# - report(issue) is called with each ValidationIssue, including unknown gcodes (which are reported even without validating).
+#   The issues are printed if None
+#
+# Returns the number of lines read from the input file
+def process_file(in_file, out_file, analyze=None, transform=None, progress=None, validator=None, batch_size=DEFAULT_BATCH_SIZE, queue_depth=DEFAULT_QUEUE_DEPTH, validate=True, report=None):
+	read_queue = queue.Queue(queue_depth)
+	write_queue = queue.Queue(queue_depth)
+	stop = threading.Event()
+
+	def put(q, item):
+		# Don't block forever if the other side of the queue failed
+		while not stop.is_set():
+			try:
+				q.put(item, timeout=0.1)
+				return True
+			except queue.Full:
+				pass
+		return False
+
+	def get(q):
+		# Returns None (end of stream) if the pipeline was stopped
+		while not stop.is_set():
+			try:
+				return q.get(timeout=0.1)
+			except queue.Empty:
+				pass
+		return None
+
+	# Line ending of the input, and if its last line ends with one. Set by the reader before the batches are queued
+	file_format = {"newline": "\n", "final_newline": True}
+
+	def read():
+		try:
+			with src:
+				first = True
+				while True:
+					lines = list(itertools.islice(src, batch_size))
+					if not lines:
+						break
+					if first:
+						file_format["newline"] = _line_ending(lines[0])
+						first = False
+					file_format["final_newline"] = lines[-1].endswith("\n")
+					if not put(read_queue, lines):
+						return
+		finally:
+			put(read_queue, None)
+
+	def write():
+		with open(out_file, "w", newline='') as f:
+			newline = None
+			while True:
+				gcodes = get(write_queue)
+				if gcodes is None:
+					break
+				if not gcodes:
+					continue
+				# The newline ending each batch is written at the start of the next one, so the last one can be left
+				# out if the input didn't end with a newline
+				if newline is None:
+					newline = file_format["newline"]
+				else:
+					f.write(newline)
+				write_gcodes(f, gcodes, newline, False)
+			if newline is not None and file_format["final_newline"]:
+				f.write(newline)
+
+	# Open the input first, so a missing input fails before the output is created (and truncated)
+	src = open(in_file, "r", newline='')
+	reader = _PipelineStage("gcode-reader", read, stop)
+	writer = _PipelineStage("gcode-writer", write, stop)
+	reader.start()
+	writer.start()
+
+	if validate and validator is None:
+		validator = Validator()
+	elif not validate:
+		validator = None
+	if report is None:
+		report = print
+
+	factory = GCodeFactory()
+	count = 0
+	parsed = 0
+	try:
+		while True:
+			lines = get(read_queue)
+			if lines is None:
+				break
+
+			if analyze:
+				analyze(lines)
+
+			gcodes = []
+			for line in lines:
+				g = factory.create_from_line(line)
+				if isinstance(g, GCodeUnknown):
+					report(ValidationIssue(parsed + len(gcodes), g.name, "Unknown gcode element: {0}".format(line.rstrip())))
+				gcodes.append(g)
+			if validator:
+				for issue in validator.validate(gcodes, parsed):
+					report(issue)
+			parsed += len(gcodes)
+			if transform:
+				gcodes = transform(gcodes)
+
+			if not put(write_queue, gcodes):
+				break
+			count += len(lines)
+			if progress:
+				progress(count)
+	except BaseException:
+		stop.set()
+		raise
+	finally:
+		put(write_queue, None)
+		writer.join()
+		stop.set()
+		reader.join()
+
+	for stage in (reader, writer):
+		if stage.error:
+			raise stage.error
+	return count
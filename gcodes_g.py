@@ -0,0 +1,214 @@
+# Populated with info from https://www.reprap.org/wiki/G-code and https://github.com/prusa3d/Prusa-Firmware/blob/MK3/Firmware/Marlin_main.cpp
+
+from gcodes import GCode, GCodeParted
+
+# ============= G-GCodes =============
+
+class GCodeMove(GCodeParted):
+	def __init__(self, typ, line, known_parts="XYZEFS"):
+		GCodeParted.__init__(self, known_parts, float, typ, line)
+
+	def is_linear_move(self):
+		return None
+
+	# Position to move to on X
+	def x(self):
+		return self._get_part('X')
+
+	# Position to move to on Y
+	def y(self):
+		return self._get_part('Y')
+
+	# Position to move to on Z
+	def z(self):
+		return self._get_part('Z')
+
+	# Amount ot extrude between start and stop
+	def e(self):
+		return self._get_part('E')
+
+	# Feedrate per minute
+	def f(self):
+		return self._get_part('F')
+
+	# Laser power
+	def s(self):
+		return self._get_part('S')
+
+class GCodeRapidMove(GCodeMove):
+	def __init__(self, line):
+		GCodeMove.__init__(self, "G0", line)
+
+	def is_linear_move(self):
+		return False
+
+class GCodeLinearMove(GCodeMove):
+	def __init__(self, line):
+		GCodeMove.__init__(self, "G1", line)
+
+	def is_linear_move(self):
+		return True
+
+class GCodeArcMove(GCodeMove):
+	def __init__(self, typ, line):
+		GCodeMove.__init__(self, typ, line, "XYZEFIJR")
+
+	def is_linear_move(self):
+		return False
+
+	def is_clockwise(self):
+		return None
+
+	# Offset of the arc center from the start position on X
+	def i(self):
+		return self._get_part('I')
+
+	# Offset of the arc center from the start position on Y
+	def j(self):
+		return self._get_part('J')
+
+	# Radius, instead of I and J
+	def r(self):
+		return self._get_part('R')
+
+class GCodeClockwiseArcMove(GCodeArcMove):
+	def __init__(self, line):
+		GCodeArcMove.__init__(self, "G2", line)
+
+	def is_clockwise(self):
+		return True
+
+class GCodeCounterClockwiseArcMove(GCodeArcMove):
+	def __init__(self, line):
+		GCodeArcMove.__init__(self, "G3", line)
+
+	def is_clockwise(self):
+		return False
+
+class GCodeDwell(GCodeParted):
+	def __init__(self, line):
+		GCodeParted.__init__(self, "PS", int, "G4", line)
+
+	def time_ms(self):
+		if 'S' in self.parts:
+			return self._get_part('S') * 1000
+		elif 'P' in self.parts:
+			return self._get_part('P')
+		else:
+			return 0
+
+	def time_sec(self):
+		if 'S' in self.parts:
+			return self._get_part('S')
+		elif 'P' in self.parts:
+			return self._get_part('P') / 1000.0
+		else:
+			return 0
+
+class GCodeSetUnitsToInches(GCode):
+	def __init__(self, line):
+		GCode.__init__(self, "G20")
+
+		self._populate_known_fields(line)
+
+	def raw(self):
+		return self._create_raw("")
+
+class GCodeSetUnitsToMillimeters(GCode):
+	def __init__(self, line):
+		GCode.__init__(self, "G21")
+
+		self._populate_known_fields(line)
+
+	def raw(self):
+		return self._create_raw("")
+
+class GCodeHome(GCodeParted):
+	def __init__(self, line):
+		#GCodeParted.__init__(self, "XYZWC", lambda value, cmd: "" if value == '' else int(value), "G28", line)
+		#Prusa supprts specifying an offset for the homing access, and for models with TMC2130 (MK3/S) it can calibrate the axis's with C. Not very important unless doing some really crazy things
+
+		GCodeParted.__init__(self, "XYZW", lambda value, cmd: '', "G28", line)
+
+		self._home_x = False
+		self._home_y = False
+		self._home_z = False
+		self._mbl = False
+
+		if len(self.parts) == 0:
+			self._home_x = True
+			self._home_y = True
+			self._home_z = True
+			self._mbl = True
+		else:
+			self._mbl = True
+			if 'X' in self.parts: self._home_x = True
+			if 'Y' in self.parts: self._home_y = True
+			if 'Z' in self.parts: self._home_z = True
+			if 'W' in self.parts: self._mbl = False
+
+	def home_x(self):
+		return self._home_x
+
+	def home_y(self):
+		return self._home_y
+
+	def home_z(self):
+		return self._home_z
+
+	# Only valid for Prusa firmware (MK2/MK3)
+	def perform_mesh_bed_leveling(self):
+		return self._mbl
+
+class GCodeMeshBedLeveling(GCodeParted):
+	def __init__(self, line):
+		GCodeParted.__init__(self, "NR", int, "G80", line)
+
+	def mesh_grid_points(self):
+		return self._get_part('N')
+
+	def retry_count(self):
+		return self._get_part('R')
+
+class GCodePrintMeshBedLevel(GCode):
+	def __init__(self, line):
+		GCode.__init__(self, "G81")
+
+		self._populate_known_fields(line)
+
+	def raw(self):
+		return self._create_raw("")
+
+class GCodeSetToAbsolutePositioning(GCode):
+	def __init__(self, line):
+		GCode.__init__(self, "G90")
+
+		self._populate_known_fields(line)
+
+	def raw(self):
+		return self._create_raw("")
+
+class GCodeSetToRelativePositioning(GCode):
+	def __init__(self, line):
+		GCode.__init__(self, "G91")
+
+		self._populate_known_fields(line)
+
+	def raw(self):
+		return self._create_raw("")
+
+class GCodeSetPosition(GCodeParted):
+	def __init__(self, line):
+		GCodeParted.__init__(self, "XYZE", float, "G92", line)
+
+	def x(self):
+		return self._get_part('X')
+
+	def y(self):
+		return self._get_part('Y')
+
+	def z(self):
+		return self._get_part('Z')
+
+	def e(self):
+		return self._get_part('E')
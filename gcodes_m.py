@@ -0,0 +1,278 @@
+# Populated with info from https://www.reprap.org/wiki/G-code and https://github.com/prusa3d/Prusa-Firmware/blob/MK3/Firmware/Marlin_main.cpp
+
+from gcodes import GCode, GCodeParted, GCodePartedExtruderChoice
+
+# ============= M-GCodes =============
+
+class GCodeSetBuildPercentage(GCodeParted):
+	def __init__(self, line):
+		GCodeParted.__init__(self, "PRQS", int, "M73", line)
+
+	def precentage_complete(self):
+		return self._get_part('P')
+
+	def prusa_version(self):
+		if ('P' in self.parts and 'R' in self.parts) or ('Q' in self.parts and 'S' in self.parts):
+			return GCodeSetBuildPercentagePrusa(self._line)
+		return None
+
+class GCodeSetBuildPercentagePrusa(GCodeSetBuildPercentage):
+	def __init__(self, line):
+		GCodeSetBuildPercentage.__init__(self, line)
+
+	def prusa_version(self):
+		return self
+
+	def is_regular_precentage(self):
+		return 'P' in self.parts and 'R' in self.parts
+
+	def precentage_complete(self):
+		if self.is_regular_precentage():
+			return self._get_part('P')
+		else:
+			return self._get_part('Q')
+
+	def minutes_remaining(self):
+		if self.is_regular_precentage():
+			return self._get_part('R')
+		else:
+			return self._get_part('S')
+
+class GCodeSetExtruderToAbsoluteMode(GCode):
+	def __init__(self, line):
+		GCode.__init__(self, "M82")
+
+		self._populate_known_fields(line)
+
+	def raw(self):
+		return self._create_raw("")
+
+class GCodeSetExtruderToRelativeMode(GCode):
+	def __init__(self, line):
+		GCode.__init__(self, "M83")
+
+		self._populate_known_fields(line)
+
+	def raw(self):
+		return self._create_raw("")
+
+class GCodeSetExtruderTemperature(GCodePartedExtruderChoice):
+	def __init__(self, line):
+		GCodePartedExtruderChoice.__init__(self, "S", int, "M104", line)
+
+	def temperature(self):
+		return self._get_part('S')
+
+class GCodeFanOn(GCodeParted):
+	# RepRapFirmware supports a bunch of other params... but I've not seen these (probably because I've not seen a non-Marlin running printer)
+
+	def __init__(self, line):
+		GCodeParted.__init__(self, "PS", float, "M106", line)
+
+	def fan_index(self):
+		if 'P' in self.parts:
+			return self._get_part('P')
+		return 0
+
+	def fan_speed(self):
+		if 'S' in self.parts:
+			return self._get_part('S')
+		return 255
+
+class GCodeFanOff(GCode):
+	def __init__(self, line):
+		GCode.__init__(self, "M107")
+
+		self._populate_known_fields(line)
+
+	def raw(self):
+		return self._create_raw("")
+
+class GCodeSetExtruderTemperatureAndWait(GCodePartedExtruderChoice):
+	def __init__(self, line):
+		GCodePartedExtruderChoice.__init__(self, "SR", int, "M109", line)
+
+	def wait_for_cooldown(self):
+		return 'R' in self.parts
+
+	def temperature(self):
+		# S takes precedence over R, so do that first
+		if 'S' in self.parts:
+			return self._get_part('S')
+		return self._get_part('R')
+
+class GCodeFirmwareCapabilities(GCode):
+	TYPE_GET_FW_VERSION = 'V'
+	TYPE_TEST_FW_VERSION = 'U'
+	TYPE_GET_FW_INFO = ''
+
+	def __init__(self, line):
+		GCode.__init__(self, "M115")
+
+		self.typ = GCodeFirmwareCapabilities.TYPE_GET_FW_INFO
+		self.test_fw_version = None
+
+		content = self._populate_known_fields(line)
+		if content:
+			content = content.strip()
+
+			if content.startswith(GCodeFirmwareCapabilities.TYPE_GET_FW_VERSION):
+				self.typ = GCodeFirmwareCapabilities.TYPE_GET_FW_VERSION
+			elif content.startswith(GCodeFirmwareCapabilities.TYPE_TEST_FW_VERSION):
+				self.typ = GCodeFirmwareCapabilities.TYPE_TEST_FW_VERSION
+				self.test_fw_version = content[1:]
+				if self.test_fw_version.strip() == '':
+					print("WARN: M115 is testing firmware version, but missing the version")
+
+	def type(self):
+		return self.typ
+
+	def test_fw_version(self):
+		return self.test_fw_version
+
+	def raw(self):
+		content = self.typ
+		if self.typ == GCodeFirmwareCapabilities.TYPE_TEST_FW_VERSION:
+			content = "{0}{1}".format(content, self.test_fw_version)
+		return self._create_raw(content)
+
+class GCodeSetBedTemperature(GCodeParted):
+	def __init__(self, line):
+		GCodeParted.__init__(self, "S", int, "M140", line)
+
+	def temperature(self):
+		return self._get_part('S')
+
+class GCodeSetBedTemperatureAndWait(GCodeParted):
+	def __init__(self, line):
+		GCodeParted.__init__(self, "SR", int, "M190", line)
+
+	def wait_for_cooldown(self):
+		return 'R' in self.parts
+
+	def temperature(self):
+		# S takes precedence over R, so do that first
+		if 'S' in self.parts:
+			return self._get_part('S')
+		return self._get_part('R')
+
+class GCodeMaxPrintingAcceleration(GCodeParted):
+	def __init__(self, line):
+		GCodeParted.__init__(self, "XYZE", int, "M201", line)
+
+	def x(self):
+		return self._get_part('X')
+
+	def y(self):
+		return self._get_part('Y')
+
+	def z(self):
+		return self._get_part('Z')
+
+	def e(self):
+		return self._get_part('E')
+
+class GCodeMaxFeedrate(GCodeParted):
+	def __init__(self, line):
+		GCodeParted.__init__(self, "XYZE", int, "M203", line)
+
+	def x(self):
+		return self._get_part('X')
+
+	def y(self):
+		return self._get_part('Y')
+
+	def z(self):
+		return self._get_part('Z')
+
+	def e(self):
+		return self._get_part('E')
+
+class GCodeSetDefaultAcceleration(GCodeParted):
+	def __init__(self, line):
+		GCodeParted.__init__(self, "PRST", int, "M204", line)
+
+	# From Prusa firmware:
+	# - Old: S (all moves), T (filament move)
+	# - New: P (print move), T (travel move), R (filament move)
+
+	# Move while printing (mm/s^2)
+	def print(self):
+		if 'S' in self.parts:
+			return self._get_part('S')
+		return self._get_part('P')
+
+	# Filament movement (mm/s^2)
+	def filament(self):
+		if 'S' in self.parts:
+			return self._get_part('T')
+		return self._get_part('R')
+
+	# Move without printing (mm/s^2)
+	def travel(self):
+		if 'S' in self.parts:
+			return self._get_part('S')
+		return self._get_part('T')
+
+class GCodeAdvancedSetting(GCodeParted):
+	def __init__(self, line):
+		GCodeParted.__init__(self, "STBXYZE", lambda value, cmd: float(value) if cmd != 'S' and cmd != 'T' else int(value), "M205", line)
+
+	def min_feedrate(self):
+		return self._get_part('S')
+
+	def min_travel_feedrate(self):
+		return self._get_part('T')
+
+	def min_segment_time(self):
+		return self._get_part('B')
+
+	def max_x_jerk(self):
+		return self._get_part('X')
+
+	def max_y_jerk(self):
+		return self._get_part('Y')
+
+	def max_z_jerk(self):
+		return self._get_part('Z')
+
+	def max_e_jerk(self):
+		return self._get_part('E')
+
+class GCodeSetExtrudeFactorOverrude(GCodePartedExtruderChoice):
+	def __init__(self, line):
+		GCodePartedExtruderChoice.__init__(self, "S", int, "M221", line)
+
+	# Precentage
+	def override_factor(self):
+		return self._get_part('S')
+
+class GCodePausePrint(GCode):
+	# Prusa firmware pause, the printer parks the head and waits for the user to resume
+
+	def __init__(self, line):
+		GCode.__init__(self, "M601")
+
+		self._populate_known_fields(line)
+
+	def raw(self):
+		return self._create_raw("")
+
+class GCodeSetLinearAdvanceScalingFactors(GCodeParted):
+	def __init__(self, line):
+		GCodeParted.__init__(self, "KRWHD", float, "M900", line)
+
+	def advance_k_factor(self):
+		return self._get_part('K')
+
+	def direct_ratio(self):
+		return self._get_part('R')
+
+	def ratio_width(self):
+		return self._get_part('W')
+
+	def ratio_height(self):
+		return self._get_part('H')
+
+	def ratio_diameter(self):
+		return self._get_part('D')
@@ -0,0 +1,64 @@
+# Populated with info from https://www.reprap.org/wiki/G-code and https://github.com/prusa3d/Prusa-Firmware/blob/MK3/Firmware/Marlin_main.cpp
+
+from gcodes import GCodeParted
+
+# ============= T-GCodes =============
+
+class GCodeToolChange(GCodeParted):
+	def __init__(self, line):
+		cmd = "T0"
+		tool = 0
+		if len(line) >= 2 and line[0] == 'T':
+			parts = line.split(' ')
+			tool_str = parts[0][1:]
+			if tool_str.isdigit():
+				tool = int(tool_str)
+			elif tool_str == '?' or tool_str == 'x' or tool_str == 'c':
+				tool = tool_str
+			else:
+				print("WARN: Unknown tool change: {0}".format(line))
+		else:
+			print("WARN: Tool change has an invalid value: {0}".format(line))
+
+		if tool != 0:
+			cmd = "T{0}".format(tool)
+		GCodeParted.__init__(self, "P", int, cmd, line)
+
+		self._tool = tool
+		self._original_tool = tool
+
+	def _is_unmodified(self):
+		return GCodeParted._is_unmodified(self) and self._tool == self._original_tool
+
+	def tool(self):
+		if isinstance(self._tool, int):
+			return self._tool
+		else:
+			return None
+
+	# Change the tool, keeping the other parts and the comment
+	def set_tool(self, tool):
+		self._tool = tool
+		self.name = "T{0}".format(tool)
+
+	def macro_bitmask(self):
+		return self._get_part('P')
+
+	def prusa_version(self):
+		return GCodeToolChangePrusa(self._line)
+
+class GCodeToolChangePrusa(GCodeToolChange):
+	def __init__(self, line):
+		GCodeToolChange.__init__(self, line)
+
+	def prusa_version(self):
+		return self
+
+	def user_request_mmu_selection(self):
+		return self._tool == '?'
+
+	def load_to_gears(self):
+		return self._tool == 'x' or self._tool == '?'
+
+	def load_to_nozzle(self):
+		return self._tool == 'c'
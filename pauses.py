@@ -0,0 +1,106 @@
+import bisect
+import re
+
+from gcodes import GCodeComment, GCodeDwell, GCodeMove, GCodeSetExtruderToAbsoluteMode, GCodeSetExtruderToRelativeMode, GCodeSetPosition, GCodeWhitespace
+
+# Regular expressions (matched case insensitively) for the comments that mark Palette pauses and ping sequences. Whole
+# words only, so comments like "; wiping nozzle" aren't markers
+DEFAULT_MARKERS = (r"\bping\b", r"\bpause\b")
+# Number of moves without extrusion in a row before they're treated as a pause
+DEFAULT_MIN_TRAVEL_RUN = 8
+
+KIND_DWELL = "dwell"
+KIND_MARKER = "marker"
+KIND_TRAVEL = "travel"
+
+# A region of gcodes (first and last are inclusive indices) where the print is paused or not extruding
+class PauseRegion:
+	def __init__(self, first, last, kinds):
+		self.first = first
+		self.last = last
+		self.kinds = kinds
+
+	def __repr__(self):
+		return "PauseRegion(first={0}, last={1}, kinds={2})".format(self.first, self.last, sorted(self.kinds))
+
+# Interval index of the pause and ping regions of a list of gcodes. Built in one pass, regions are sorted and don't overlap
+class PauseIndex:
+	def __init__(self, gcodes, markers=DEFAULT_MARKERS, min_travel_run=DEFAULT_MIN_TRAVEL_RUN):
+		self.regions = []
+		self._build(gcodes, re.compile('|'.join(["(?:{0})".format(m) for m in markers]), re.IGNORECASE), min_travel_run)
+		self._lasts = [r.last for r in self.regions]
+
+	def _add(self, first, last, kind):
+		# Regions are found in order of their last index, so only regions at the end can overlap or touch the new one
+		# (a run of travel moves is added after any markers inside it)
+		kinds = {kind}
+		while self.regions and first <= self.regions[-1].last + 1:
+			region = self.regions.pop()
+			first = min(first, region.first)
+			last = max(last, region.last)
+			kinds |= region.kinds
+		self.regions.append(PauseRegion(first, last, kinds))
+
+	def _build(self, gcodes, marker, min_travel_run):
+		relative_e = False
+		e = 0.0
+		run_first = None
+		run_last = None
+		run_length = 0
+
+		def finish_run():
+			if run_length >= min_travel_run:
+				self._add(run_first, run_last, KIND_TRAVEL)
+
+		for i, g in enumerate(gcodes):
+			if isinstance(g, GCodeMove):
+				new_e = g.e()
+				extruding = False
+				if new_e is not None:
+					if relative_e:
+						extruding = new_e != 0
+					else:
+						extruding = new_e != e
+						e = new_e
+				if extruding:
+					finish_run()
+					run_length = 0
+				else:
+					if run_length == 0:
+						run_first = i
+					run_last = i
+					run_length += 1
+				continue
+
+			if isinstance(g, GCodeComment):
+				if marker.search(g.comment):
+					self._add(i, i, KIND_MARKER)
+				continue
+			if isinstance(g, GCodeWhitespace):
+				continue
+
+			# Any other command ends a run of travel moves. Finish it first so the regions stay in order
+			finish_run()
+			run_length = 0
+
+			if isinstance(g, GCodeDwell):
+				self._add(i, i, KIND_DWELL)
+			elif isinstance(g, GCodeSetExtruderToAbsoluteMode):
+				relative_e = False
+			elif isinstance(g, GCodeSetExtruderToRelativeMode):
+				relative_e = True
+			elif isinstance(g, GCodeSetPosition) and g.e() is not None:
+				e = g.e()
+		finish_run()
+
+	# The region that contains index, or the closest region before it. None if there is no region at or before index
+	def nearest_before(self, index):
+		i = bisect.bisect_left(self._lasts, index)
+		if i < len(self.regions) and self.regions[i].first <= index:
+			return self.regions[i]
+		if i > 0:
+			return self.regions[i - 1]
+		return None
+
+	def __len__(self):
+		return len(self.regions)
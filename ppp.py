@@ -81,82 +81,73 @@ def get_extruders_and_temps_old(original, max_diff):
 	#todo
 	return [ex for ex in extruders if extruders["used"]]
 
-def get_extruders_and_temps(original):
-	extruders = [
-		{
-			"einit": 0,
-			"enorm": 0,
-			"binit": 0,
-			"bnorm": 0,
-			"used": False
-		}, {
-			"einit": 0,
-			"enorm": 0,
-			"binit": 0,
-			"bnorm": 0,
-			"used": False
-		}, {
-			"einit": 0,
-			"enorm": 0,
-			"binit": 0,
-			"bnorm": 0,
-			"used": False
-		}, {
-			"einit": 0,
-			"enorm": 0,
-			"binit": 0,
-			"bnorm": 0,
-			"used": False
-		}
-	]
-
-	def get_info(cmd, op):
-		unit = None
-		mod = op[5:]
-
-		if mod[0] != "S":
-			raise Exception("unknown {0} command: {1}".format(cmd, op))
-
-		maxChars = 0
-		for c in mod[1:]:
-			if c == ' ':
-				break
-			maxChars += 1
-		temp = int(mod[1:maxChars + 1])
-		mod = mod[maxChars + 2:]
-
-		if mod[0] == "T":
-			unit = int(mod[1])
-
-		return [unit, temp]
-
-	def populate(comment, field):
+def _get_info(cmd, op):
+	unit = None
+	temp = None
+
+	# S and T can be in any order, and either can be missing. Anything after a ; is a comment
+	mod = op[len(cmd):]
+	if mod.find(';') >= 0:
+		mod = mod[:mod.find(';')]
+	for part in mod.split():
+		if part[0] == "S" and len(part) > 1:
+			temp = int(float(part[1:]))
+		elif part[0] == "T" and len(part) > 1:
+			unit = int(part[1:])
+
+	if temp is None:
+		raise Exception("unknown {0} command: {1}".format(cmd, op.strip()))
+
+	return [unit, temp]
+
+# Collects the extruders and temperatures of a file from its raw lines. The lines can be given in batches (like the analyze
+# hook of gcodefile.process_file does), the result is only complete once every line was analyzed as the slicer writes the
+# temperature settings at the end of the file
+class ExtruderAnalyzer:
+	def __init__(self):
+		self._extruders = []
+		for i in range(4):
+			self._extruders.append({
+				"einit": 0,
+				"enorm": 0,
+				"binit": 0,
+				"bnorm": 0,
+				"used": False,
+				"index": i
+			})
+
+	def _populate(self, comment, field):
 		values = comment[comment.find("=")+1:].strip().split(',')
-		i = 0
-		for v in values:
-			extruders[i][field] = int(values[i])
-			i += 1
+		for i in range(min(len(values), len(self._extruders))):
+			self._extruders[i][field] = int(float(values[i]))
 
-	for op in original:
-		if op.upper().startswith("M104"):
-			if op.upper().startswith("M104 S0"):
-				continue
+	def analyze(self, lines):
+		for op in lines:
+			if op.upper().startswith("M104"):
+				if op.upper().startswith("M104 S0"):
+					continue
 
-			results = get_info("M104", op.upper())
+				results = _get_info("M104", op.upper())
+
+				if results[0] != None and 0 <= results[0] < len(self._extruders):
+					self._extruders[results[0]]["used"] = True
 
-			if results[0] != None:
-				extruders[results[0]]["used"] = True
+			if op.lower().startswith("; temperature"):
+				self._populate(op, "enorm")
+			elif op.lower().startswith("; bed_temperature"):
+				self._populate(op, "bnorm")
+			elif op.lower().startswith("; first_layer_temperature"):
+				self._populate(op, "einit")
+			elif op.lower().startswith("; first_layer_bed_temperature"):
+				self._populate(op, "binit")
 
-		if op.lower().startswith("; temperature"):
-			populate(op, "enorm")
-		elif op.lower().startswith("; bed_temperature"):
-			populate(op, "bnorm")
-		elif op.lower().startswith("; first_layer_temperature"):
-			populate(op, "einit")
-		elif op.lower().startswith("; first_layer_bed_temperature"):
-			populate(op, "binit")
+	def extruders(self):
+		return [ex for ex in self._extruders if ex["used"]]
 
-	return [ex for ex in extruders if ex["used"]]
+def get_extruders_and_temps(original):
+	analyzer = ExtruderAnalyzer()
+	analyzer.analyze(original)
+	return analyzer.extruders()
 
 def needs_processing(extruder_temps, max_diff):
 	minExN = 0
@@ -0,0 +1,299 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import gcodefile
+import ppp
+from gcodes import GCodeFactory
+from validation import Validator
+
+# Long running processing daemon: jobs are submitted over a Unix domain socket and run by a pool of worker processes that
+# keep the gcode classes loaded between jobs. Parsing is pure Python, so the workers are processes and not threads,
+# otherwise jobs would run one at a time no matter how many workers there are.
+#
+# Protocol: the client sends one JSON object per connection on a single line, the server replies with JSON objects,
+# one per line.
+# - {"cmd": "submit", "in": <path>, "out": <path>, "max_diff": <int>} replies with "queued", "started", "progress"
+#   events and ends with a "done" or "error" event. When the temperatures are within max_diff of each other the file
+#   doesn't need processing and is copied as-is ("processed" is false in the "done" event). If the temperatures can't be
+#   read, "analysis_error" says why and the file is processed anyway. "issues" has the validation issues and unknown
+#   gcodes of the file ({"line", "name", "message"}, at most MAX_REPORTED_ISSUES of them, "issue_count" has the total)
+# - {"cmd": "stats"} replies with one "stats" event
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "ppp-{0}.sock".format(os.getuid()))
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_DIFF = 10
+# Most validation issues sent back with a job, so a badly broken file doesn't make a huge event ("issue_count" has the total)
+MAX_REPORTED_ISSUES = 100
+
+# Number of extruders the analysis found the file using, None if it doesn't know (tool indices aren't checked then)
+def _used_extruder_count(extruders):
+	if not extruders:
+		return None
+	return max([ex["index"] for ex in extruders]) + 1
+
+# Check the temperatures of in_file and process it to out_file if they're too far apart. Returns the "done" event
+def run_job(in_file, out_file, max_diff, progress=None):
+	result = {
+		"lines": 0,
+		"extruders": None,
+		"needs_processing": True,
+		"processed": False,
+		"issues": [],
+		"issue_count": 0
+	}
+	# The temperatures decide if the file is processed at all and the extruders are needed to validate it, so they're read
+	# in a pass over the raw lines before the pipeline runs, and not with its analyze hook
+	try:
+		analyzer = ppp.ExtruderAnalyzer()
+		with open(in_file, "r") as f:
+			analyzer.analyze(f)
+		extruders = analyzer.extruders()
+		result["extruders"] = extruders
+		result["needs_processing"] = ppp.needs_processing(extruders, max_diff)
+	except Exception as e:
+		# Not knowing the temperatures isn't a reason to fail the job, it just can't be skipped
+		result["analysis_error"] = str(e)
+
+	if result["needs_processing"]:
+		def report(issue):
+			if len(result["issues"]) < MAX_REPORTED_ISSUES:
+				result["issues"].append({"line": issue.index + 1, "name": issue.name, "message": issue.message})
+			result["issue_count"] += 1
+
+		validator = Validator(used_extruders=_used_extruder_count(result["extruders"]))
+		result["lines"] = gcodefile.process_file(in_file, out_file, progress=progress, validator=validator, report=report)
+		result["processed"] = True
+	else:
+		shutil.copyfile(in_file, out_file)
+	return result
+
+def _warm_worker():
+	# Once per worker process, so no job pays for loading the gcode classes
+	GCodeFactory().load_all()
+
+# Runs in a worker process. Events are sent back through the job's events queue, which ends with None
+def _work(in_file, out_file, max_diff, events):
+	events.put({"event": "started"})
+	start = time.time()
+	try:
+		result = run_job(in_file, out_file, max_diff, lambda lines: events.put({"event": "progress", "lines": lines}))
+		result["event"] = "done"
+		result["sec"] = time.time() - start
+		events.put(result)
+	except Exception as e:
+		events.put({"event": "error", "message": str(e)})
+	finally:
+		events.put(None)
+
+class JobServer:
+	def __init__(self, socket_path=DEFAULT_SOCKET, workers=DEFAULT_WORKERS):
+		self.socket_path = socket_path
+		self._lock = threading.Lock()
+		self._started = time.time()
+		self._workers = workers
+		self._queued = 0
+		self._active = 0
+		self._completed = 0
+		self._failed = 0
+		self._lines = 0
+		# Wall clock time with at least one job running, and when the current stretch of it started
+		self._busy_time = 0.0
+		self._busy_since = None
+
+		# Spawned and not forked, the server's threads shouldn't be copied into the workers
+		context = multiprocessing.get_context("spawn")
+		self._manager = context.Manager()
+		self._pool = ProcessPoolExecutor(workers, mp_context=context, initializer=_warm_worker)
+
+		if os.path.exists(socket_path):
+			os.unlink(socket_path)
+		server = self
+
+		class Handler(socketserver.StreamRequestHandler):
+			def handle(self):
+				server._handle(self.rfile, self.wfile)
+
+		self._server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+		self._server.daemon_threads = True
+
+	def serve_forever(self):
+		try:
+			self._server.serve_forever()
+		finally:
+			self._server.server_close()
+			self._pool.shutdown(wait=False, cancel_futures=True)
+			self._manager.shutdown()
+			if os.path.exists(self.socket_path):
+				os.unlink(self.socket_path)
+
+	def shutdown(self):
+		self._server.shutdown()
+
+	def stats(self):
+		with self._lock:
+			busy_time = self._busy_time
+			if self._busy_since is not None:
+				busy_time += time.time() - self._busy_since
+			return {
+				"queue_depth": self._queued,
+				"workers": self._workers,
+				"active": self._active,
+				"completed": self._completed,
+				"failed": self._failed,
+				"lines": self._lines,
+				"lines_per_sec": self._lines / busy_time if busy_time > 0 else 0.0,
+				"uptime_sec": time.time() - self._started
+			}
+
+	def _submit(self, in_file, out_file, max_diff, send):
+		events = self._manager.Queue()
+		with self._lock:
+			self._queued += 1
+			queue_depth = self._queued
+		try:
+			future = self._pool.submit(_work, in_file, out_file, max_diff, events)
+		except Exception as e:
+			with self._lock:
+				self._queued -= 1
+				self._failed += 1
+			send({"event": "error", "message": str(e)})
+			return
+
+		def finished(future):
+			# The worker process died, it never got to end the events
+			if future.exception() is not None:
+				events.put({"event": "error", "message": str(future.exception())})
+				events.put(None)
+		future.add_done_callback(finished)
+
+		send({"event": "queued", "queue_depth": queue_depth})
+		started = False
+		try:
+			while True:
+				event = events.get()
+				if event is None:
+					break
+				with self._lock:
+					if event["event"] == "started":
+						started = True
+						if self._active == 0:
+							self._busy_since = time.time()
+						self._queued -= 1
+						self._active += 1
+					elif event["event"] == "done":
+						self._completed += 1
+						self._lines += event["lines"]
+					elif event["event"] == "error":
+						self._failed += 1
+				send(event)
+		finally:
+			with self._lock:
+				if not started:
+					self._queued -= 1
+				else:
+					self._active -= 1
+					if self._active == 0:
+						self._busy_time += time.time() - self._busy_since
+						self._busy_since = None
+
+	def _handle(self, rfile, wfile):
+		client = {"connected": True}
+
+		def send(event):
+			# Keep following the job if the client went away, so the stats stay right
+			if not client["connected"]:
+				return
+			try:
+				wfile.write((json.dumps(event) + "\n").encode())
+				wfile.flush()
+			except OSError:
+				client["connected"] = False
+
+		try:
+			request = json.loads(rfile.readline())
+		except ValueError as e:
+			send({"event": "error", "message": "invalid request: {0}".format(e)})
+			return
+
+		cmd = request.get("cmd")
+		if cmd == "stats":
+			stats = self.stats()
+			stats["event"] = "stats"
+			send(stats)
+		elif cmd == "submit":
+			if "in" not in request or "out" not in request:
+				send({"event": "error", "message": "submit needs 'in' and 'out' paths"})
+				return
+			self._submit(request["in"], request["out"], request.get("max_diff", DEFAULT_MAX_DIFF), send)
+		else:
+			send({"event": "error", "message": "unknown command: {0}".format(cmd)})
+
+# ============= Client =============
+
+def _request(socket_path, request, on_event=None):
+	last = None
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+		s.connect(socket_path)
+		s.sendall((json.dumps(request) + "\n").encode())
+		with s.makefile("rb") as f:
+			for line in f:
+				last = json.loads(line)
+				if on_event:
+					on_event(last)
+	return last
+
+# Submit a job and wait for it to finish. Returns the final event ("done" or "error")
+def submit(in_file, out_file, max_diff=DEFAULT_MAX_DIFF, socket_path=DEFAULT_SOCKET, on_event=None):
+	request = {
+		"cmd": "submit",
+		"in": os.path.abspath(in_file),
+		"out": os.path.abspath(out_file),
+		"max_diff": max_diff
+	}
+	return _request(socket_path, request, on_event)
+
+def stats(socket_path=DEFAULT_SOCKET):
+	return _request(socket_path, {"cmd": "stats"})
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Palette post processor daemon")
+	parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix domain socket path")
+	commands = parser.add_subparsers(dest="command", required=True)
+
+	serve_parser = commands.add_parser("serve", help="run the daemon")
+	serve_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+
+	submit_parser = commands.add_parser("submit", help="submit a file to the daemon and wait for it to finish")
+	submit_parser.add_argument("input")
+	submit_parser.add_argument("output")
+	submit_parser.add_argument("--max-diff", type=int, default=DEFAULT_MAX_DIFF)
+
+	commands.add_parser("stats", help="print the daemon's stats")
+
+	args = parser.parse_args()
+	if args.command == "serve":
+		# Clean up the socket and the workers when stopped with kill too
+		signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+		JobServer(args.socket, args.workers).serve_forever()
+	elif args.command == "submit":
+		def print_event(event):
+			if event["event"] == "progress":
+				print("{0} lines".format(event["lines"]))
+			else:
+				print(json.dumps(event))
+		result = submit(args.input, args.output, args.max_diff, args.socket, print_event)
+		if not result or result["event"] != "done":
+			sys.exit(1)
+	else:
+		print(json.dumps(stats(args.socket)))
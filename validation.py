@@ -0,0 +1,105 @@
+# Validation of parsed gcodes. The range checks used to be done (and printed) by each gcode when it was created; they're
+# now done here in one pass over a batch of gcodes: the values being checked are collected into columns and every rule
+# then runs over its columns.
+
+# Hottest extruder and bed temperatures that aren't reported as too high
+DEFAULT_MAX_TEMPERATURE = 300
+DEFAULT_MAX_BED_TEMPERATURE = 120
+
+_EXTRUDER_TEMPERATURE_CODES = ("M104", "M109")
+_BED_TEMPERATURE_CODES = ("M140", "M190")
+_EXTRUDER_CHOICE_CODES = ("M104", "M109", "M221")
+_MOVE_CODES = ("G0", "G1", "G2", "G3")
+
+class ValidationIssue:
+	def __init__(self, index, name, message):
+		# Index of the gcode the issue is for
+		self.index = index
+		self.name = name
+		self.message = message
+
+	def __repr__(self):
+		return "ValidationIssue(index={0}, name={1}, message={2})".format(self.index, self.name, self.message)
+
+	def __str__(self):
+		return "WARN: {0}".format(self.message)
+
+class _Columns:
+	def __init__(self):
+		# [index, name, temperature parameter, temperature]
+		self.temperatures = [[], [], [], []]
+		# [index, name, extruder]
+		self.extruders = [[], [], []]
+		# [index, factor]
+		self.factors = [[], []]
+		# [index, name, E] for moves in absolute extrusion mode
+		self.absolute_e = [[], [], []]
+
+def _append(columns, *values):
+	for column, value in zip(columns, values):
+		column.append(value)
+
+# Validates batches of gcodes. Keeps the extrusion mode between batches, so a file can be validated as it's streamed
+class Validator:
+	def __init__(self, used_extruders=None, max_temperature=DEFAULT_MAX_TEMPERATURE, max_bed_temperature=DEFAULT_MAX_BED_TEMPERATURE):
+		# Number of extruders the file uses (None to not check tool indices)
+		self.used_extruders = used_extruders
+		self.max_temperature = max_temperature
+		self.max_bed_temperature = max_bed_temperature
+		self._relative_e = False
+
+	def _collect(self, gcodes, first_index):
+		columns = _Columns()
+		for i, g in enumerate(gcodes, first_index):
+			name = g.name
+			if name in _MOVE_CODES:
+				if not self._relative_e and 'E' in g.parts:
+					_append(columns.absolute_e, i, name, g.parts['E'])
+			elif name[0] == 'T':
+				tool = g.tool()
+				if tool is not None:
+					_append(columns.extruders, i, name, tool)
+			elif name == "M82":
+				self._relative_e = False
+			elif name == "M83":
+				self._relative_e = True
+			elif name[0] == 'M':
+				if name in _EXTRUDER_TEMPERATURE_CODES or name in _BED_TEMPERATURE_CODES:
+					c = 'S' if 'S' in g.parts else 'R'
+					if c in g.parts:
+						_append(columns.temperatures, i, name, c, g.parts[c])
+				if name in _EXTRUDER_CHOICE_CODES and 'T' in g.parts:
+					_append(columns.extruders, i, name, g.parts['T'])
+				if name == "M221" and 'S' in g.parts:
+					_append(columns.factors, i, g.parts['S'])
+		return columns
+
+	# Validate gcodes, first_index is the index of the first gcode in the whole file. Returns the issues in file order
+	def validate(self, gcodes, first_index=0):
+		columns = self._collect(gcodes, first_index)
+		issues = []
+
+		index, name, param, temperature = columns.temperatures
+		issues += [ValidationIssue(i, n, "{0} has an invalid temperature. Must be 0 or greater. Was {1}{2}".format(n, c, t))
+			for i, n, c, t in zip(index, name, param, temperature) if t < 0]
+		issues += [ValidationIssue(i, n, "{0} has a temperature above the maximum of {1}. Was {2}{3}".format(n, self.max_temperature if n in _EXTRUDER_TEMPERATURE_CODES else self.max_bed_temperature, c, t))
+			for i, n, c, t in zip(index, name, param, temperature)
+			if t > (self.max_temperature if n in _EXTRUDER_TEMPERATURE_CODES else self.max_bed_temperature)]
+
+		index, name, extruder = columns.extruders
+		issues += [ValidationIssue(i, n, "{0} has an invalid extruder. Must be 0 or greater. Was T{1}".format(n, e))
+			for i, n, e in zip(index, name, extruder) if e < 0]
+		if self.used_extruders is not None:
+			issues += [ValidationIssue(i, n, "{0} uses extruder T{1}, but only {2} extruders are used".format(n, e, self.used_extruders))
+				for i, n, e in zip(index, name, extruder) if e >= self.used_extruders]
+
+		index, factor = columns.factors
+		issues += [ValidationIssue(i, "M221", "M221 has an invalid override factor. Must be 0 to 100. Was S{0}".format(f))
+			for i, f in zip(index, factor) if f < 0 or f > 100]
+
+		index, name, e = columns.absolute_e
+		issues += [ValidationIssue(i, n, "{0} moves the extruder to a negative position in absolute mode. Was E{1}".format(n, v))
+			for i, n, v in zip(index, name, e) if v < 0]
+
+		issues.sort(key=lambda issue: issue.index)
+		return issues